@@ -0,0 +1,391 @@
+# cases.py
+
+import contextlib
+import io
+import logging
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from peer_node import PeerNode
+from game_logic import MaxleGame
+from maxle_odds import ODDS
+from net_discovery import Interface
+from scheduler import TimerWheel
+import node_log
+
+PASSWORD = 'bench'
+LOOPBACK_ADDR = ('127.0.0.1', 50000)
+LOOPBACK = Interface('lo', '127.0.0.1', '255.0.0.0', '127.255.255.255', True)
+
+# name -> (setup function, unit, threshold). setup returns (op, ops_per_call, teardown)
+# threshold overrides the allowed slowdown for cases that depend on the scheduler (sockets, threads)
+CASES = {}
+IO_THRESHOLD = 0.5
+
+
+def case(name, unit='ops/s', threshold=None):
+    def register(fn):
+        CASES[name] = (fn, unit, threshold)
+        return fn
+    return register
+
+
+class LoopbackBus:
+    '''In-process replacement for the broadcast domain, every datagram reaches every other node'''
+    def __init__(self):
+        self.nodes = []
+        self.sent = 0
+
+    def deliver(self, sender, data):
+        self.sent += 1
+        for node in self.nodes:
+            if node is not sender:
+                node._process_datagram(data, LOOPBACK_ADDR)
+
+
+class BenchNode(PeerNode):
+    '''
+    PeerNode whose datagrams go to a LoopbackBus instead of a socket.
+    Everything above the socket (encode, decode, ordering, NACK) is the real code.
+    '''
+    def __init__(self, password, bus=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            super().__init__(password, interfaces=[LOOPBACK])
+        self.bus = bus
+        if bus: bus.nodes.append(self)
+
+    def _send_datagram(self, data):
+        if self.bus: self.bus.deliver(self, data)
+
+    def drain(self):
+        n = 0
+        while not self.ui_queue.empty():
+            self.ui_queue.get_nowait()
+            n += 1
+        return n
+
+
+class TcpListener:
+    '''Accepts loopback TCP connections on an ephemeral port and feeds them to the node'''
+    def __init__(self, node):
+        self.node = node
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try: conn, _ = self.sock.accept()
+            except OSError: return
+            threading.Thread(target=self.node._handle_tcp_stream, args=(conn,), daemon=True).start()
+
+    def connect(self):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        s.connect(('127.0.0.1', self.port))
+        return s
+
+    def close(self):
+        self.sock.close()
+
+
+def _players(n):
+    return [f"p{i:07d}" for i in range(n)]
+
+
+def _heartbeat(players):
+    return {
+        'type': 'HEARTBEAT', 'state': 'RUNNING', 'round_id': 7,
+        'players': players, 'scores': {p: i % 3 for i, p in enumerate(players)}
+    }
+
+
+def _sender(peer_id='remote01'):
+    node = BenchNode(PASSWORD)
+    node.id = peer_id
+    return node
+
+
+def _quiet(fn):
+    '''Wrap an op so its prints do not dominate the measurement'''
+    sink = io.StringIO()
+    def op():
+        with contextlib.redirect_stdout(sink):
+            fn()
+        sink.seek(0)
+        sink.truncate()
+    return op
+
+
+# Protocol hot paths
+
+@case('encode_heartbeat')
+def bench_encode_heartbeat():
+    node = BenchNode(PASSWORD)
+    players = _players(6)
+    def op():
+        node._encode_message(_heartbeat(players))
+    return op, 1, None
+
+
+@case('decode_heartbeat')
+def bench_decode_heartbeat():
+    node = BenchNode(PASSWORD)
+    node.final_player_list = _players(6)
+    data, = _sender()._encode_message(_heartbeat(_players(6)))
+    def op():
+        node._process_datagram(data, LOOPBACK_ADDR)
+    return op, 1, None
+
+
+@case('large_heartbeat_roundtrip')
+def bench_large_heartbeat_roundtrip():
+    '''Heartbeat of a big room: compressed, fragmented, reassembled and applied'''
+    node = BenchNode(PASSWORD)
+    players = _players(400)
+    node.final_player_list = players
+    sender = _sender()
+    def op():
+        for data in sender._encode_message(_heartbeat(players)):
+            node._process_datagram(data, LOOPBACK_ADDR)
+    return op, 1, None
+
+
+@case('reliable_in_order', unit='msgs/s')
+def bench_reliable_in_order():
+    node = BenchNode(PASSWORD)
+    sender = _sender()
+    batch = []
+    for _ in range(500):
+        sender.my_seq += 1
+        msg = {'type': 'ANNOUNCE', 'value': 42, 'sender_id': sender.id, 'round_id': 1, 'seq': sender.my_seq}
+        batch.extend(sender._encode_message(msg))
+    def op():
+        node.remote_seqs.clear()
+        for data in batch:
+            node._process_datagram(data, LOOPBACK_ADDR)
+        node.drain()
+    return op, len(batch), None
+
+
+@case('holdback_reorder', unit='msgs/s')
+def bench_holdback_reorder():
+    '''Worst case ordering: a window arrives reversed, so all but one go to holdback and NACKs fire'''
+    node = BenchNode(PASSWORD, LoopbackBus())
+    sender = _sender()
+    window = []
+    for seq in range(1, 33):
+        msg = {'type': 'ANNOUNCE', 'value': 42, 'sender_id': sender.id, 'round_id': 1, 'seq': seq}
+        window.extend(sender._encode_message(msg))
+    window.reverse()
+    def op():
+        node.remote_seqs.clear()
+        node.holdback_queue.clear()
+        for timer in node.nack_timers.values(): timer.cancel()
+        node.nack_timers.clear()
+        for data in window:
+            node._process_datagram(data, LOOPBACK_ADDR)
+        node.drain()
+    return op, len(window), None
+
+
+@case('udp_receive_burst', unit='msgs/s', threshold=IO_THRESHOLD)
+def bench_udp_receive_burst():
+    '''
+    Burst of sequenced datagrams over a real loopback socket through the receive
+    pipeline (batched drain, tag filter, decode, rx_queue, ordering stage).
+    '''
+    node = BenchNode(PASSWORD)
+    rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, node.rcvbuf)
+    rx.bind(('127.0.0.1', 0))
+    target = rx.getsockname()
+    threading.Thread(target=node._receive_loop, args=(rx,), daemon=True).start()
+    threading.Thread(target=node._process_udp, daemon=True).start()
+
+    sender = _sender()
+    tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    burst = 256
+    state = {'seq': 0}
+
+    def op():
+        first = state['seq']
+        for _ in range(burst):
+            state['seq'] += 1
+            msg = {'type': 'ANNOUNCE', 'value': 42, 'sender_id': sender.id, 'round_id': 1, 'seq': state['seq']}
+            for data in sender._encode_message(msg):
+                tx.sendto(data, target)
+        node.remote_seqs[sender.id] = node.remote_seqs.get(sender.id, first)
+        deadline = time.perf_counter() + 2.0
+        while node.remote_seqs.get(sender.id) != state['seq'] and time.perf_counter() < deadline:
+            time.sleep(0.0005)
+        # Losses leave gaps in the holdback queue, skip them so the next burst starts clean
+        node.remote_seqs[sender.id] = state['seq']
+        node.holdback_queue.clear()
+        node.drain()
+
+    def teardown():
+        node.running = False
+        rx.close()
+        tx.close()
+    return op, burst, teardown
+
+
+@case('timer_schedule_cancel')
+def bench_timer_schedule_cancel():
+    '''Arm and cancel a timer, what every NACK and decision deadline costs'''
+    wheel = TimerWheel()
+    def op():
+        wheel.call_later(0.5, len, ()).cancel()
+    return op, 1, None
+
+
+@case('debug_log_disabled')
+def bench_debug_log_disabled():
+    '''A debug call in the receive path while the level is INFO, should cost next to nothing'''
+    log = node_log.get_logger('bench')
+    logging.getLogger(node_log.ROOT).setLevel('INFO')
+    def op():
+        log.debug("rx", type='HEARTBEAT', sender='remote01', seq=None)
+    return op, 1, None
+
+
+@case('handle_nack')
+def bench_handle_nack():
+    '''NACK for the oldest message in a full history, the slowest lookup'''
+    node = BenchNode(PASSWORD, LoopbackBus())
+    for _ in range(node.msg_history.maxlen):
+        node._send_reliable_broadcast({'type': 'ANNOUNCE', 'value': 42, 'round_id': 1})
+    oldest = node.msg_history[0]['seq']
+    def op():
+        node._handle_nack(oldest)
+    return op, 1, None
+
+
+# Game logic
+
+@case('validate_announcement')
+def bench_validate_announcement():
+    game = MaxleGame(PASSWORD)
+    pairs = [(c, p) for p in [0] + game.order for c in game.order]
+    def op():
+        for claim, prev in pairs:
+            game.validate_announcement(claim, prev)
+    return op, len(pairs), None
+
+
+@case('secure_cup')
+def bench_secure_cup():
+    game = MaxleGame(PASSWORD)
+    def op():
+        game.secure_cup(43, 51)
+    return op, 1, None
+
+
+@case('odds_lookup')
+def bench_odds_lookup():
+    pairs = list(ODDS.advice)
+    def op():
+        for prev, claim in pairs:
+            ODDS.expected_strikes(prev, claim)
+            ODDS.recommend(prev, claim)
+    return op, len(pairs), None
+
+
+# Loopback TCP
+
+@case('token_handoff_tcp', unit='tokens/s', threshold=IO_THRESHOLD)
+def bench_token_handoff_tcp():
+    sender = BenchNode(PASSWORD)
+    receiver = BenchNode(PASSWORD)
+    sender.alive_players = receiver.alive_players = [sender.id, receiver.id]
+    listener = TcpListener(receiver)
+    sender.neighbor_sock = listener.connect()
+    sender.neighbor_id = receiver.id
+    token = sender.game_engine.secure_cup(43, 51)
+    token['round_id'] = receiver.round_id
+
+    def handoff():
+        if not sender._send_tcp_token_with_ack(token):
+            raise RuntimeError('token was not acknowledged')
+        receiver.ui_queue.get(timeout=5)
+
+    def teardown():
+        sender.neighbor_sock.close()
+        listener.close()
+    return _quiet(handoff), 1, teardown
+
+
+def _answer(decision):
+    '''What the bench player types: check every claim, announce the lowest value'''
+    return '31' if 'Announce' in decision.prompt else 'n'
+
+
+def _bench_rounds(n_nodes):
+    '''
+    Full rounds across n nodes through the real game loop handlers: the starter opens the
+    announce decision, its INPUT event broadcasts ANNOUNCE and passes the cup over loopback
+    TCP, the neighbour checks and broadcasts ROUND_OVER, every node handles it and picks the
+    next starter. Only the 2 second pause before the next round is skipped.
+    '''
+    bus = LoopbackBus()
+    nodes = [BenchNode(PASSWORD, bus) for _ in range(n_nodes)]
+    players = sorted(n.id for n in nodes)
+    nodes.sort(key=lambda n: n.id)
+    by_id = {n.id: n for n in nodes}
+    listeners = []
+    for node in nodes:
+        node.final_player_list = list(players)
+        node.alive_players = list(players)
+        node.game_running = True
+        node.max_strikes = float('inf')  # nobody is eliminated, every round is alike
+        node.timers.start()  # the skipped pauses run out there without effect
+        listeners.append(TcpListener(node))
+    for i, node in enumerate(nodes):
+        nxt = (i + 1) % n_nodes
+        node.neighbor_sock = listeners[nxt].connect()
+        node.neighbor_id = nodes[nxt].id
+    state = {'starter': nodes[0]}
+
+    def play_round():
+        target = {node: node.round_id + 1 for node in nodes}
+        starter = state['starter']
+        starter._post_turn_start(starter.round_id)
+        deadline = time.perf_counter() + 5
+        while any(node.round_id < target[node] for node in nodes):
+            if time.perf_counter() > deadline:
+                raise RuntimeError('round did not finish')
+            for node in nodes:
+                try: event = node.ui_queue.get_nowait()
+                except queue.Empty:
+                    if node.decision: node._on_input_line(_answer(node.decision))
+                    continue
+                node._check_decision()
+                node._handle_event(event)
+        state['starter'] = by_id[nodes[0].active_player_id]
+
+    def teardown():
+        for node in nodes:
+            node.timers.stop()
+            node.neighbor_sock.close()
+        for listener in listeners:
+            listener.close()
+    return _quiet(play_round), 1, teardown
+
+
+@case('rounds_3_nodes', unit='rounds/s', threshold=IO_THRESHOLD)
+def bench_rounds_3_nodes():
+    return _bench_rounds(3)
+
+
+@case('rounds_8_nodes', unit='rounds/s', threshold=IO_THRESHOLD)
+def bench_rounds_8_nodes():
+    return _bench_rounds(8)
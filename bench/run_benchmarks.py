@@ -0,0 +1,121 @@
+# run_benchmarks.py
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from cases import CASES
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_THRESHOLD = 0.25
+MIN_SAMPLE_TIME = 0.5
+REPEATS = 7
+
+
+def measure(name):
+    '''
+    Run one case and return its throughput. Every sample calls the op until
+    MIN_SAMPLE_TIME has passed; the median of REPEATS samples is reported, so
+    a single sample disturbed by other processes (or a lucky one) does not move it.
+    '''
+    setup, unit, _ = CASES[name]
+    op, ops_per_call, teardown = setup()
+    try:
+        op()  # warm up
+        samples = []
+        for _ in range(REPEATS):
+            calls = 0
+            start = time.perf_counter()
+            while True:
+                op()
+                calls += 1
+                elapsed = time.perf_counter() - start
+                if elapsed >= MIN_SAMPLE_TIME: break
+            samples.append(calls * ops_per_call / elapsed)
+    finally:
+        if teardown: teardown()
+    return {'value': statistics.median(samples), 'unit': unit}
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results):
+    data = {
+        'meta': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'system': platform.system(),
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        },
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results, baseline, threshold):
+    '''
+    Returns the names of cases whose throughput fell more than threshold below the baseline.
+    Cases with their own threshold use the larger of both.
+    '''
+    regressions = []
+    print(f"\n{'case':<24}{'result':>22}{'baseline':>14}{'change':>10}")
+    for name, res in results.items():
+        base = (baseline or {}).get('results', {}).get(name)
+        line = f"{name:<24}{res['value']:>12.0f} {res['unit']:<9}"
+        if not base:
+            print(f"{line}{'-':>14}{'new':>10}")
+            continue
+        change = res['value'] / base['value'] - 1
+        flag = ''
+        if change < -max(threshold, CASES[name][2] or 0):
+            regressions.append(name)
+            flag = '  << REGRESSION'
+        print(f"{line}{base['value']:>14.0f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for protocol and game hot paths")
+    parser.add_argument("-k", dest="pattern", default="", help="Only run cases containing this string")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown before a case counts as regression (0.25 = 25%%)")
+    parser.add_argument("--update", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--list", action="store_true", help="List cases and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (_, unit, _) in CASES.items(): print(f"{name} [{unit}]")
+        sys.exit(0)
+
+    results = {}
+    for name in CASES:
+        if args.pattern not in name: continue
+        print(f"[Bench] {name} ...", flush=True)
+        results[name] = measure(name)
+
+    baseline = load_baseline(args.baseline)
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.update:
+        if baseline and args.pattern:
+            # Partial run only replaces the measured cases
+            baseline['results'].update(results)
+            results = baseline['results']
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline written to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
@@ -0,0 +1,68 @@
+# input_reader.py
+
+import itertools
+import sys
+import threading
+import time
+
+
+class InputReader:
+    '''
+    The only thread that reads stdin. Every line is handed to on_line, so the game
+    never blocks in input() and keeps handling network events while a player thinks.
+    '''
+    def __init__(self, on_line, stream=None):
+        self.on_line = on_line
+        self.stream = stream or sys.stdin
+        self._thread = None
+
+    def start(self):
+        if self._thread: return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try: line = self.stream.readline()
+            except (OSError, ValueError): return
+            if not line: return  # EOF
+            self.on_line(line.rstrip('\r\n'))
+
+
+class Decision:
+    '''
+    A question to the player that is answered by a later input line.
+
+    parse       turns the line into the answer, raises ValueError to ask again
+    on_answer   called with the parsed answer
+    timeout     seconds until the decision expires, None waits forever
+    on_expire   called instead of on_answer when the deadline passed
+    void_reason returns None while the decision still makes sense, otherwise a
+                message why it was cancelled (e.g. the round was voided)
+    '''
+    _ids = itertools.count(1)
+
+    def __init__(self, prompt, parse, on_answer, timeout=None, on_expire=None, void_reason=None):
+        self.id = next(Decision._ids)
+        self.prompt = prompt
+        self.parse = parse
+        self.on_answer = on_answer
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.on_expire = on_expire
+        self.void_reason = void_reason or (lambda: None)
+        self.timer = None  # deadline timer, set by whoever schedules it
+
+    def expired(self, now=None):
+        if self.deadline is None: return False
+        return (now or time.monotonic()) >= self.deadline
+
+    def remaining(self):
+        '''Seconds until the deadline, None without deadline'''
+        if self.deadline is None: return None
+        return max(0.0, self.deadline - time.monotonic())
+
+
+def parse_yes_no(text):
+    cmd = text.strip().lower()
+    if cmd not in ['y', 'n']: raise ValueError("")
+    return cmd
@@ -1,14 +1,45 @@
 # main.py
 
 import argparse
-from peer_node import PeerNode
+import net_discovery
+import node_log
+from peer_node import PeerNode, UDP_RCVBUF, FEC_DEPTH
 
 # start of program. 
 # start with a parameter, the parameter is the password
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("password", help="Room Password")
+    parser.add_argument("password", nargs="?", help="Room Password")
+    parser.add_argument("--rcvbuf", type=int, default=UDP_RCVBUF, help="UDP receive buffer size in bytes")
+    parser.add_argument("--hints", action="store_true", help="Show odds and a trust/check hint when receiving the cup")
+    parser.add_argument("--fec-depth", type=int, default=FEC_DEPTH,
+                        help="Previous reliable messages repeated in every reliable datagram (0 disables)")
+    parser.add_argument("--iface", action="append", metavar="NAME_OR_IP",
+                        help="Interface to play on, repeat for several (default: all non-loopback)")
+    parser.add_argument("--multicast", metavar="GROUP", help="Use this multicast group instead of subnet broadcast")
+    parser.add_argument("--list-ifaces", action="store_true", help="Show the available interfaces and exit")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Level of diagnostic logging")
+    parser.add_argument("--log-file", help="Write diagnostics to this file (rotating, 1 MiB x 3)")
+    parser.add_argument("--log-console", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Diagnostics from this level on are also shown on stderr")
     args = parser.parse_args()
 
-    node = PeerNode(args.password)
+    available = net_discovery.list_interfaces()
+    if args.list_ifaces:
+        print(net_discovery.describe(available))
+        raise SystemExit(0)
+    if args.password is None:
+        parser.error("the following arguments are required: password")
+    node_log.setup_logging(args.log_level, args.log_file, args.log_console)
+    try:
+        interfaces = net_discovery.select_interfaces(available, args.iface)
+    except ValueError as e:
+        parser.error(f"{e}\nAvailable:\n{net_discovery.describe(available)}")
+
+    try:
+        node = PeerNode(args.password, rcvbuf=args.rcvbuf, show_hints=args.hints, fec_depth=args.fec_depth,
+                        interfaces=interfaces, multicast_group=args.multicast)
+    except OSError as e:
+        raise SystemExit(f"[!] {e}\nAvailable:\n{net_discovery.describe(available)}")
     node.start()
\ No newline at end of file
@@ -0,0 +1,150 @@
+# maxle_odds.py
+
+import json
+import os
+from fractions import Fraction
+from game_logic import MaxleGame
+
+# Bump when the table layout or the model changes, old cache files are rebuilt
+CACHE_VERSION = 1
+CACHE_FILE = os.environ.get(
+    'MAXLE_ODDS_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'maxle', f'odds_v{CACHE_VERSION}.json')
+)
+
+
+class MaxleOdds:
+    '''
+    Exact probability tables for Mäxle, built once and afterwards only looked up.
+    All probabilities are Fractions over the 36 equally likely rolls of two dice.
+    A claim of 0 means "no previous claim" (first announcement of a round).
+
+    roll_prob[v]            chance to roll v
+    beat_prob[prev]         chance that one roll beats prev
+    beating[prev][v]        chance to roll v, for every v that beats prev
+    expected[(prev, claim)] expected strikes for the receiver as (trust, check)
+    advice[(prev, claim)]   'y' (trust) or 'n' (check), whichever costs less
+
+    Expected strikes use a simple model of the announcer: they rolled fairly, told the
+    truth if the roll beat prev and otherwise bluffed with a uniformly chosen valid claim.
+      check: P(claim is true) * strikes for a failed check (2 for Mäxle, else 1)
+      trust: 1 for a Mäxle (you take the hit), else the chance that your own roll does
+             not beat the claim, so you are forced to bluff with one strike at risk
+    '''
+    def __init__(self, tables):
+        self.roll_prob = tables['roll_prob']
+        self.beat_prob = tables['beat_prob']
+        self.beating = tables['beating']
+        self.expected = tables['expected']
+        self.advice = tables['advice']
+
+    def chance_to_beat(self, prev):
+        return self.beat_prob[prev]
+
+    def chance_of_roll(self, prev, roll):
+        '''Chance that the next roll is exactly roll and beats prev'''
+        return self.beating[prev].get(roll, Fraction(0))
+
+    def expected_strikes(self, prev, claim):
+        return self.expected[(prev, claim)]
+
+    def recommend(self, prev, claim):
+        return self.advice[(prev, claim)]
+
+    def hint(self, prev, claim):
+        '''One line summary for a player deciding about claim'''
+        trust, check = self.expected[(prev, claim)]
+        choice = "Trust" if self.advice[(prev, claim)] == 'y' else "Check"
+        return (f"[HINT] Beat {claim}: {float(self.beat_prob[claim]):.0%} | "
+                f"Expected strikes trust {float(trust):.2f} / check {float(check):.2f} -> {choice}")
+
+
+def build_tables(game=None):
+    '''Enumerate all 36 rolls and derive every table from them'''
+    game = game or MaxleGame('')
+    claims = [0] + game.order
+
+    counts = {v: 0 for v in game.order}
+    for d1 in range(1, 7):
+        for d2 in range(1, 7):
+            counts[game.normalize(d1, d2)] += 1
+    roll_prob = {v: Fraction(c, 36) for v, c in counts.items()}
+
+    beating = {}
+    beat_prob = {}
+    for prev in claims:
+        beating[prev] = {v: p for v, p in roll_prob.items() if game.is_higher(v, prev)}
+        beat_prob[prev] = sum(beating[prev].values(), Fraction(0))
+
+    expected = {}
+    advice = {}
+    for prev in claims:
+        legal = beating[prev]
+        bluff = 1 - beat_prob[prev]
+        for claim in legal:
+            p_true = legal[claim] / (legal[claim] + bluff / len(legal))
+            if claim == 21:
+                trust, check = Fraction(1), 2 * p_true
+            else:
+                trust, check = 1 - beat_prob[claim], p_true
+            expected[(prev, claim)] = (trust, check)
+            advice[(prev, claim)] = 'y' if trust <= check else 'n'
+
+    return {
+        'roll_prob': roll_prob, 'beat_prob': beat_prob, 'beating': beating,
+        'expected': expected, 'advice': advice
+    }
+
+
+def _dump(tables, order):
+    '''Fractions are stored as "n/d" strings, tuple keys as "prev:claim"'''
+    def f(x): return f"{x.numerator}/{x.denominator}"
+    return {
+        'version': CACHE_VERSION,
+        'order': order,
+        'roll_prob': {str(v): f(p) for v, p in tables['roll_prob'].items()},
+        'beat_prob': {str(v): f(p) for v, p in tables['beat_prob'].items()},
+        'beating': {str(prev): {str(v): f(p) for v, p in rolls.items()} for prev, rolls in tables['beating'].items()},
+        'expected': {f"{prev}:{claim}": [f(t), f(c)] for (prev, claim), (t, c) in tables['expected'].items()},
+        'advice': {f"{prev}:{claim}": a for (prev, claim), a in tables['advice'].items()},
+    }
+
+
+def _load(data):
+    def pair(key):
+        prev, claim = key.split(':')
+        return int(prev), int(claim)
+    return {
+        'roll_prob': {int(v): Fraction(p) for v, p in data['roll_prob'].items()},
+        'beat_prob': {int(v): Fraction(p) for v, p in data['beat_prob'].items()},
+        'beating': {int(prev): {int(v): Fraction(p) for v, p in rolls.items()} for prev, rolls in data['beating'].items()},
+        'expected': {pair(k): (Fraction(t), Fraction(c)) for k, (t, c) in data['expected'].items()},
+        'advice': {pair(k): a for k, a in data['advice'].items()},
+    }
+
+
+def load_odds(path=CACHE_FILE):
+    '''
+    Load the tables from the cache file, rebuild and store them if the file is
+    missing, from another version or for another ranking. Cache errors are not fatal.
+    '''
+    order = MaxleGame('').order
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') == CACHE_VERSION and data.get('order') == order:
+            return MaxleOdds(_load(data))
+    except (OSError, ValueError, KeyError, TypeError, AttributeError): pass  # broken or foreign file, rebuild
+
+    tables = build_tables()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(_dump(tables, order), f)
+        os.replace(tmp, path)
+    except OSError: pass
+    return MaxleOdds(tables)
+
+
+ODDS = load_odds()
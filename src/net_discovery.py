@@ -0,0 +1,142 @@
+# net_discovery.py
+
+import ipaddress
+import socket
+import struct
+from collections import namedtuple
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+# Linux ioctls, see netdevice(7)
+SIOCGIFFLAGS = 0x8913
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891b
+IFF_UP = 0x1
+IFF_BROADCAST = 0x2
+IFF_LOOPBACK = 0x8
+LIMITED_BROADCAST = '255.255.255.255'
+
+Interface = namedtuple('Interface', ['name', 'ip', 'netmask', 'broadcast', 'is_loopback'])
+
+
+def broadcast_address(ip, netmask):
+    '''
+    Directed broadcast of the subnet, e.g. 10.0.0.4/255.255.255.0 -> 10.0.0.255
+    and 172.16.5.9/255.255.240.0 -> 172.16.15.255. None for /31 and /32, they have no broadcast.
+    '''
+    net = ipaddress.IPv4Network(f"{ip}/{netmask}", strict=False)
+    if net.prefixlen >= 31: return None
+    return str(net.broadcast_address)
+
+
+def _ioctl(sock, request, name):
+    ifreq = struct.pack('256s', name.encode()[:15])
+    return fcntl.ioctl(sock.fileno(), request, ifreq)
+
+
+def _linux_interfaces():
+    result = []
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for _, name in socket.if_nameindex():
+            try:
+                flags = struct.unpack('H', _ioctl(s, SIOCGIFFLAGS, name)[16:18])[0]
+                ip = socket.inet_ntoa(_ioctl(s, SIOCGIFADDR, name)[20:24])
+                netmask = socket.inet_ntoa(_ioctl(s, SIOCGIFNETMASK, name)[20:24])
+            except OSError:
+                continue  # no IPv4 address
+            if not flags & IFF_UP: continue
+            is_loopback = bool(flags & IFF_LOOPBACK)
+            # Loopback has no broadcast flag but Linux delivers 127.255.255.255 to all local sockets
+            bcast = broadcast_address(ip, netmask) if flags & IFF_BROADCAST or is_loopback else None
+            result.append(Interface(name, ip, netmask, bcast, is_loopback))
+    finally:
+        s.close()
+    return result
+
+
+def _fallback_interfaces():
+    '''Without ioctl only the addresses of the hostname are known, the netmask is a guess (/24)'''
+    result = [Interface('lo', '127.0.0.1', '255.0.0.0', '127.255.255.255', True)]
+    try:
+        infos = socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET)
+    except OSError:
+        return result
+    for ip in sorted({info[4][0] for info in infos}):
+        if ip.startswith('127.'): continue
+        result.append(Interface(ip, ip, '255.255.255.0', broadcast_address(ip, '255.255.255.0'), False))
+    return result
+
+
+def list_interfaces():
+    '''All interfaces that are up and have an IPv4 address, with their real netmask'''
+    if fcntl is not None and hasattr(socket, 'if_nameindex'):
+        try:
+            found = _linux_interfaces()
+            if found: return found
+        except OSError: pass
+    return _fallback_interfaces()
+
+
+def select_interfaces(interfaces, wanted=None):
+    '''
+    Pick the interfaces to play on. wanted is a list of interface names or IPs,
+    without it every non-loopback interface is used and loopback only if there is nothing else.
+    '''
+    if wanted:
+        chosen = [i for i in interfaces if i.name in wanted or i.ip in wanted]
+        missing = set(wanted) - {i.name for i in chosen} - {i.ip for i in chosen}
+        if missing:
+            raise ValueError(f"Unknown interface(s): {', '.join(sorted(missing))}")
+        return chosen
+
+    chosen = [i for i in interfaces if not i.is_loopback]
+    return chosen or [i for i in interfaces if i.is_loopback]
+
+
+def send_target(iface, multicast_group=None):
+    '''Where datagrams for this interface go: the group, the subnet broadcast or, for /31 and /32, 255.255.255.255'''
+    return multicast_group or iface.broadcast or LIMITED_BROADCAST
+
+
+def open_send_socket(iface, multicast_group=None):
+    '''
+    UDP socket bound to the interface address, so datagrams leave on that interface
+    with its IP as source. Returns (socket, target ip), raises OSError if the socket can not be opened.
+    '''
+    target = send_target(iface, multicast_group)
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.bind((iface.ip, 0))
+        if multicast_group:
+            s.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(iface.ip))
+            s.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        else:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    except OSError:
+        s.close()
+        raise
+    if target == LIMITED_BROADCAST and hasattr(socket, 'SO_BINDTODEVICE'):
+        # The source address alone does not pick the interface for 255.255.255.255 (needs CAP_NET_RAW)
+        try: s.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, iface.name.encode())
+        except OSError: pass
+    return s, target
+
+
+def join_multicast(sock, group, interfaces):
+    '''Join the group on every interface, the socket is bound to the wildcard address'''
+    for iface in interfaces:
+        mreq = struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton(iface.ip))
+        try: sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        except OSError: pass
+
+
+def describe(interfaces):
+    lines = []
+    for i in interfaces:
+        prefix = ipaddress.IPv4Network(f"{i.ip}/{i.netmask}", strict=False).prefixlen
+        lines.append(f" {i.name:<10} {i.ip}/{prefix:<3} broadcast {i.broadcast or LIMITED_BROADCAST + ' (no subnet broadcast)'}")
+    return "\n".join(lines)
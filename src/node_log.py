@@ -0,0 +1,107 @@
+# node_log.py
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+
+ROOT = 'maxle'
+LOG_FORMAT = '%(asctime)s %(levelname)-7s %(component)-6s node=%(node)s %(message)s%(field_text)s'
+
+_node_id = '-'
+_listener = None
+
+logging.getLogger(ROOT).addHandler(logging.NullHandler())
+
+
+class ComponentLogger(logging.LoggerAdapter):
+    '''
+    Logger of one component (net, ring, game, ...). Keyword arguments become
+    key=value fields of the record:  log.debug("cup passed", to=neighbor_id)
+    When the level is disabled the call returns before anything is formatted.
+    '''
+    def debug(self, msg, *args, **kwargs):
+        # Shortcut for the hot paths, skips the adapter layers when debug is off
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def process(self, msg, kwargs):
+        fields = {k: kwargs.pop(k) for k in list(kwargs) if k not in ('exc_info', 'stack_info', 'stacklevel', 'extra')}
+        kwargs['extra'] = {'fields': fields}
+        return msg, kwargs
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    '''
+    Puts the record itself into the queue. The stock QueueHandler formats it on the calling
+    thread (prepare) under the handler lock, here that work is left to the writer thread.
+    The queue stays in this process, so nothing has to be pickled. Field values are
+    rendered later, so pass copies of containers that keep changing.
+    '''
+    def handle(self, record):
+        # No handler lock, SimpleQueue.put is thread safe on its own
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord): record = rv
+        if rv: self.emit(record)
+        return rv
+
+    def prepare(self, record):
+        record.node = _node_id
+        return record
+
+
+class _RecordFormatter(logging.Formatter):
+    '''Adds component and the rendered key=value fields, runs on the writer thread'''
+    def format(self, record):
+        record.component = record.name.rpartition('.')[2]
+        fields = getattr(record, 'fields', None)
+        record.field_text = ''.join(f" {k}={v}" for k, v in fields.items()) if fields else ''
+        if not hasattr(record, 'node'): record.node = _node_id
+        return super().format(record)
+
+
+def get_logger(component):
+    return ComponentLogger(logging.getLogger(f"{ROOT}.{component}"), {})
+
+
+def set_node_id(node_id):
+    global _node_id
+    _node_id = node_id
+
+
+def setup_logging(level='INFO', log_file=None, console_level='WARNING', max_bytes=1 << 20, backups=3):
+    '''
+    Route all component loggers through a queue to one background writer thread.
+    The threads of the node only create the record and put it into a SimpleQueue, message,
+    fields and timestamp are formatted on the writer, which also does all I/O. Diagnostics
+    go to a rotating log file and only from console_level on to stderr, so they do not mix
+    with the game on stdout.
+    '''
+    global _listener
+    if _listener: return
+
+    formatter = _RecordFormatter(LOG_FORMAT)
+    handlers = []
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backups, encoding='utf-8'
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    console = logging.StreamHandler(sys.stderr)
+    console.setLevel(console_level)
+    console.setFormatter(formatter)
+    handlers.append(console)
+
+    q = queue.SimpleQueue()
+    queue_handler = _QueueHandler(q)
+
+    root = logging.getLogger(ROOT)
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -1,5 +1,6 @@
 # peer_node.py
 
+import errno
 import socket
 import threading
 import time
@@ -7,31 +8,72 @@ import json
 import uuid
 import hashlib
 import queue
+import select
 from collections import deque
 from game_logic import MaxleGame
+from maxle_odds import ODDS
+import net_discovery
+from input_reader import InputReader, Decision, parse_yes_no
+from scheduler import TimerWheel
+from wire import FrameEncoder, Reassembler
+import node_log
+
+net_log = node_log.get_logger('net')
+ring_log = node_log.get_logger('ring')
+game_log = node_log.get_logger('game')
 
 # Basic Game config
 DISCOVERY_TIME = 5
 BROADCAST_PORT = 50000
 TCP_PORT = 50001
-BUF_SIZE = 4096
+BUF_SIZE = 65535  # largest UDP payload, large messages arrive fragmented anyway (see wire.py)
 
 # Heartbeat config
 HEARTBEAT_INTERVAL = 1.0
 HEARTBEAT_TIMEOUT = 5.0
 NETWORK_TIMEOUT_LIMIT = 15
+LIVENESS_INTERVAL = 1.0
+
+# Retries
+NACK_TIMEOUT = 0.5  # ask again if a missing message did not arrive in this time
+NACK_RETRIES = 3
+TOKEN_RETRY_DELAY = 2.0
+
+# Player decisions (trust/check, roll, announce) expire after this many seconds
+DECISION_TIMEOUT = 60.0
 
 # History of Reliable Ordered Multicast
 HISTORY_SIZE = 50
 
+# Forward error correction, copies of recent reliable messages ride along with later datagrams
+FEC_DEPTH = 2  # previous reliable messages piggybacked on each reliable datagram, 0 disables
+FEC_WINDOW = 3.0  # heartbeats repeat the last FEC_DEPTH messages for this many seconds after sending
+
+# UDP receive pipeline
+UDP_RCVBUF = 1 << 20  # requested SO_RCVBUF, the kernel caps it at net.core.rmem_max
+UDP_BATCH_SIZE = 64  # max datagrams drained from the socket per wakeup
+UDP_QUEUE_SIZE = 256  # max decoded batches waiting for the ordering stage
+GROUP_TAG_LEN = 8  # every datagram starts with these bytes of the group hash
+
 class PeerNode:
-    def __init__(self, password):
+    def __init__(self, password, rcvbuf=UDP_RCVBUF, show_hints=False, fec_depth=FEC_DEPTH,
+                 interfaces=None, multicast_group=None):
         self.id = str(uuid.uuid4())[:8]
+        node_log.set_node_id(self.id)
         self.password = password
         self.group_hash = hashlib.sha256(password.encode()).hexdigest()
+        self.group_tag = bytes.fromhex(self.group_hash)[:GROUP_TAG_LEN]
+        self.encoder = FrameEncoder(self.group_tag)
+        self.reassembler = Reassembler(self.group_tag)
+        self.rcvbuf = rcvbuf
         
-        self.my_ip = self._detect_best_ip()
-        self.broadcast_ip = self._calculate_broadcast(self.my_ip)
+        # No default route needed, the interfaces and their netmasks come from the OS
+        self.interfaces = interfaces or net_discovery.select_interfaces(net_discovery.list_interfaces())
+        self.multicast_group = multicast_group
+        self.send_links = self._open_send_links()
+        if not self.send_links:
+            names = ', '.join(i.name for i in self.interfaces) or 'none'
+            raise OSError(f"No interface to send on (tried: {names})")
         
         self.max_strikes = 3
         self.scores = {} 
@@ -50,6 +92,7 @@ class PeerNode:
         self.neighbor_sock = None
         self.neighbor_id = None
         self.game_engine = MaxleGame(password)
+        self.show_hints = show_hints
         
         self.active_player_id = None 
         self.turn_state = "IDLE" 
@@ -59,37 +102,43 @@ class PeerNode:
         self.remote_seqs = {}  
         self.holdback_queue = {}  
         self.msg_history = deque(maxlen=HISTORY_SIZE) 
-        self.input_queue = queue.Queue()
+        # Sequence numbers and history are shared by the game loop, the timers and the NACK handler
+        self.history_lock = threading.RLock()
+        self.fec_depth = fec_depth
+        self.last_reliable_sent = float('-inf')
+        self.reported_dropouts = {}  # player id -> time of the last report, timer thread only
+        self.input_reader = InputReader(self._on_input_line)
+        self.decision = None
+
+        # All timing (heartbeats, liveness, HELLO, NACK retries, deadlines) runs on this one thread
+        self.timers = TimerWheel()
+        self.hello_timer = None
+        self.heartbeat_timer = None
+        self.liveness_timer = None
+        self.nack_timers = {}
+        self.discovery_done = threading.Event()
+        self.rx_queue = queue.Queue(maxsize=UDP_QUEUE_SIZE)
+        self.rx_dropped = 0
         self._waiting_for_ip_log = False
 
         print(f"[Init] Node Started | ID: {self.id}")
-        print(f"[Init] IP: {self.my_ip} | Broadcast Target: {self.broadcast_ip}")
+        for iface, _, target in self.send_links:
+            net_log.info("interface", name=iface.name, ip=iface.ip, target=target)
 
-    def _detect_best_ip(self):
-        '''Detect IP Interface that routes default route. 
-            8.8.8.8 is google DNS
+    def _open_send_links(self):
         '''
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(('8.8.8.8', 80)) 
-            ip = s.getsockname()[0]
-            s.close()
-            return ip
-        except: pass
-        
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(('10.255.255.255', 1))
-            ip = s.getsockname()[0]
-            s.close()
-            return ip
-        except: return '127.0.0.1'
-
-    def _calculate_broadcast(self, ip):
-        '''Highest IP in network is Broadcast for common /24 networks that is X.X.X.255'''
-        if ip == '127.0.0.1': return '255.255.255.255'
-        parts = ip.split('.')
-        return f"{parts[0]}.{parts[1]}.{parts[2]}.255"
+        One UDP socket per interface, bound to its address and sending to its broadcast
+        address (or the multicast group). Sockets are reused for every datagram.
+        Returns (interface, socket, target) for every interface that could be opened.
+        '''
+        links = []
+        for iface in self.interfaces:
+            try: s, target = net_discovery.open_send_socket(iface, self.multicast_group)
+            except OSError as e:
+                net_log.warning("interface skipped, cannot send on it", name=iface.name, ip=iface.ip, error=repr(e))
+                continue
+            links.append((iface, s, target))
+        return links
 
     def start(self):
         '''Starts listener threads one for UDP one for TCP. 
@@ -97,7 +146,10 @@ class PeerNode:
             network then join the game as spectator
         '''
         threading.Thread(target=self._listen_udp, daemon=True).start()
+        threading.Thread(target=self._process_udp, daemon=True).start()
         threading.Thread(target=self._listen_tcp, daemon=True).start()
+        self.timers.start()
+        self.input_reader.start()
 
         self._phase_discovery()
 
@@ -120,69 +172,76 @@ class PeerNode:
         self._phase_game_loop()
 
     def _start_heartbeat_system(self):
-        '''Start heartbeat threads'''
-        threading.Thread(target=self._send_heartbeats, daemon=True).start()
-        threading.Thread(target=self._monitor_liveness, daemon=True).start()
+        '''Schedule heartbeats and liveness checks on the timer wheel'''
+        self.heartbeat_timer = self.timers.call_every(HEARTBEAT_INTERVAL, self._send_heartbeat, first=0)
+        self.liveness_timer = self.timers.call_every(LIVENESS_INTERVAL, self._check_liveness)
 
-    def _send_heartbeats(self):
+    def _send_heartbeat(self):
         '''
             Send heartbeat respective to config usually one each second
             Heartbeats are also used to distribute scoreboard and game state
         '''
-        while self.running and self.game_running:
-            msg = {
-                'type': 'HEARTBEAT',
-                'state': 'RUNNING',
-                'round_id': self.round_id,
-                'players': self.alive_players,
-                'scores': self.scores
-            }
-            self._send_unreliable_broadcast(msg)
-            time.sleep(HEARTBEAT_INTERVAL)
+        if not (self.running and self.game_running):
+            self.heartbeat_timer.cancel()
+            return
+        msg = {
+            'type': 'HEARTBEAT',
+            'state': 'RUNNING',
+            'round_id': self.round_id,
+            'players': self.alive_players,
+            'scores': self.scores
+        }
+        # Repair a lost last message without waiting for a later one to reveal the gap
+        if time.monotonic() - self.last_reliable_sent < FEC_WINDOW:
+            msg['redundant'] = self._recent_reliable(self.fec_depth)
+        self._send_unreliable_broadcast(msg)
 
-    def _monitor_liveness(self):
+    def _check_liveness(self):
         '''
         Checks if all participating players are still connected, if a player is not seen in HEARTBEAT_TIMEOUT 5s
         The player disconnected event gets triggert and the player is eliminated.
+        This only detects and posts a local event, the game loop announces and eliminates.
         '''
-        while self.running and self.game_running:
-            time.sleep(1)
-            if len(self.alive_players) <= 1: continue
+        if not (self.running and self.game_running):
+            self.liveness_timer.cancel()
+            return
+        if len(self.alive_players) <= 1: return
 
-            now = time.time()
-            dead_candidates = []
-            
-            for pid in list(self.alive_players):
-                if pid == self.id: continue
-                last = self.peer_last_seen.get(pid, now)
-                if now - last > HEARTBEAT_TIMEOUT:
-                    dead_candidates.append(pid)
-            
-            for dead_id in dead_candidates:
-                if dead_id in self.alive_players:
-                    print(f"\n[!!!] TIMEOUT: Player {dead_id} stopped responding.")
-                    
-                    msg = {'type': 'PLAYER_LEFT', 'dropout': dead_id}
-                    for _ in range(3):
-                        self._send_unreliable_broadcast(msg)
-                        time.sleep(0.1)
-                    
-                    self._handle_player_left(dead_id)
+        now = time.monotonic()
+        dead_candidates = []
+        
+        for pid in list(self.alive_players):
+            if pid == self.id: continue
+            last = self.peer_last_seen.get(pid, now)
+            if now - last > HEARTBEAT_TIMEOUT:
+                dead_candidates.append(pid)
+        
+        for dead_id in dead_candidates:
+            # Still alive until the game loop handled the event, report again if it never was
+            reported = self.reported_dropouts.get(dead_id)
+            if reported is not None and now - reported < HEARTBEAT_TIMEOUT: continue
+            self.reported_dropouts[dead_id] = now
+            game_log.warning("player stopped responding", player=dead_id, timeout=HEARTBEAT_TIMEOUT)
+            self.ui_queue.put({'type': 'DROPOUT_DETECTED', 'dropout': dead_id})
+
+    def _send_hello(self):
+        self._send_unreliable_broadcast({
+            'type': 'HELLO', 
+            'current_seq': self.my_seq,
+            'known_peers': list(self.peers.keys())
+        })
 
     def _phase_discovery(self):
         '''
         Send dynamic discovery as UDP broadcast (unreliable)
+        Ends after DISCOVERY_TIME or as soon as a heartbeat of a running game arrives.
         '''
         print(f"\nPHASE 1: DISCOVERY ({DISCOVERY_TIME}s)")
-        start_time = time.time()
-        while time.time() - start_time < DISCOVERY_TIME:
-            if self.game_running: break 
-            self._send_unreliable_broadcast({
-                'type': 'HELLO', 
-                'current_seq': self.my_seq,
-                'known_peers': list(self.peers.keys())
-            })
-            time.sleep(1)
+        self.hello_timer = self.timers.call_every(1.0, self._send_hello, first=0)
+        deadline = self.timers.call_later(DISCOVERY_TIME, self.discovery_done.set)
+        self.discovery_done.wait()
+        deadline.cancel()
+        self.hello_timer.cancel()
         print(f"Peers found: {len(self.peers)}")
 
     def _phase_lobby(self):
@@ -193,14 +252,16 @@ class PeerNode:
         This also uses UDP broadcasts
         '''
         print("\n" + "="*50 + "\n LOBBY / ELECTION PHASE \n" + "="*50)
-        def input_listener():
-            while not self.game_running:
-                try:
-                    i = input()
-                    self.input_queue.put(i)
-                except: pass
-        threading.Thread(target=input_listener, daemon=True).start()
+        # HELLO every second, the tick event also re-runs the election below
+        self.hello_timer = self.timers.call_every(1.0, self._lobby_tick, first=0)
+        try: self._run_lobby()
+        finally: self.hello_timer.cancel()
 
+    def _lobby_tick(self):
+        self._send_hello()
+        self.ui_queue.put({'type': 'LOBBY_TICK'})
+
+    def _run_lobby(self):
         while not self.game_running:
             all_nodes = list(self.peers.keys()) + [self.id]
             all_nodes.sort()
@@ -216,32 +277,23 @@ class PeerNode:
                 print(f"\nDEMOTED: Higher ID {highest_id} found.")
                 self.is_leader = False
 
-            if self.is_leader:
-                try:
-                    if not self.input_queue.empty():
-                        _ = self.input_queue.get() 
-                        self._start_game_as_leader()
-                        return
-                except: pass
-            else:
-                try:
-                    event = self.ui_queue.get(block=False)
-                    if event['type'] == 'GAME_START':
-                        self.final_player_list = event['players']
-                        self.max_strikes = event['max_strikes']
-                        
-                        self.active_player_id = event.get('starting_player', self.final_player_list[-1]) 
-                        
-                        for p in self.final_player_list: self.scores[p] = 0
-                        print(f"\n[!] GAME STARTED by Leader. Active Player: {self.active_player_id}")
-                        return
-                except queue.Empty: pass
+            event = self.ui_queue.get()
+
+            # Also as leader: the GAME_START of a higher ID may arrive before any of its HELLOs
+            if event['type'] == 'GAME_START':
+                self.is_leader = False
+                self.final_player_list = event['players']
+                self.max_strikes = event['max_strikes']
+                
+                self.active_player_id = event.get('starting_player', self.final_player_list[-1]) 
+                
+                for p in self.final_player_list: self.scores[p] = 0
+                self._expect_all_players()
+                print(f"\n[!] GAME STARTED by Leader. Active Player: {self.active_player_id}")
+                return
 
-            self._send_unreliable_broadcast({
-                'type': 'HELLO', 'current_seq': self.my_seq,
-                'known_peers': list(self.peers.keys())
-            })
-            time.sleep(1)
+            if self.is_leader and event['type'] == 'INPUT' and self._start_game_as_leader():
+                return
 
     def _start_game_as_leader(self):
         '''
@@ -249,13 +301,13 @@ class PeerNode:
         The max_strikes are fixed at 3 (maybe in the future variable)
         Uses reliable broadcast to broadcast game settings
         
-        Be aware at least 2 players are necessary to play the game
+        Be aware at least 2 players are necessary to play the game, returns False if not
         '''
         current_list = list(self.peers.keys()) + [self.id]
         current_list.sort()
         if len(current_list) < 2:
             print("[!] Need at least 2 players!")
-            return
+            return False
         self.final_player_list = current_list
         self.max_strikes = 3
         
@@ -268,9 +320,19 @@ class PeerNode:
         self._send_reliable_broadcast(msg)
         
         for p in self.final_player_list: self.scores[p] = 0
+        self._expect_all_players()
         
         self.active_player_id = self.id
         self.ui_queue.put({'type': 'MY_TURN_START', 'first_round': True})
+        return True
+
+    def _expect_all_players(self):
+        '''
+        Every player of the game starts at seq 0, so FEC copies in heartbeats also repair a lost
+        first message of a player. Late joiners never call this and do not NACK old history.
+        '''
+        for p in self.final_player_list:
+            if p != self.id: self.remote_seqs.setdefault(p, 0)
 
     def _connect_to_next_neighbor(self):
         '''
@@ -292,7 +354,7 @@ class PeerNode:
 
         if self.neighbor_id != target_id:
             if self.neighbor_sock:
-                print(f" [Network] Closing stale connection to {self.neighbor_id}...")
+                ring_log.info("closing stale connection", neighbor=self.neighbor_id)
                 try: self.neighbor_sock.close()
                 except: pass
             self.neighbor_sock = None
@@ -302,16 +364,16 @@ class PeerNode:
             target_ip = self.peers.get(target_id)
             if not target_ip: target_ip = '127.0.0.1' # Fallback
             
-            print(f" [Network] Connecting to Ring Neighbor: {target_id} ({target_ip})...", end="")
+            ring_log.info("connecting to ring neighbor", neighbor=target_id, ip=target_ip)
             try:
                 s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 s.settimeout(3.0) 
                 s.connect((target_ip, TCP_PORT))
                 s.settimeout(None)
                 self.neighbor_sock = s
-                print(" Success!")
+                ring_log.info("connected to ring neighbor", neighbor=target_id)
             except:
-                print(" Failed (will retry).")
+                ring_log.warning("connecting to ring neighbor failed, will retry", neighbor=target_id, ip=target_ip)
 
     def _phase_game_loop(self):
         '''
@@ -321,46 +383,67 @@ class PeerNode:
         self._print_scoreboard()
         while self.running:
             try:
-                event = self.ui_queue.get()
-                
-                # If spectator nothing to do
-                if self.is_spectator and event['type'] in ['MY_TURN_START', 'TOKEN_RCV']:
-                     continue
-                # EVENT 1: MY TURN
-                if event['type'] == 'MY_TURN_START':
-                    self.active_player_id = self.id
-                    self._do_turn(event.get('first_round', False), event.get('prev_claim', 0))
-                # EVENT 2: Get dices from previouse player. 'Becher bekommen in der Bar'
-                elif event['type'] == 'TOKEN_RCV':
-                    token = event['token']
-                    sender = token.get('sender_id')
-                    
-                    self.active_player_id = self.id 
-                    self._handle_incoming_token(token)
-                # EVENT 3: Someone anounced a value
-                elif event['type'] == 'ANNOUNCE':
-                    sender_id = event.get('sender_id')
-                    if sender_id not in self.alive_players: continue
-                    if event.get('round_id') != self.round_id: continue
-                    
-                    self.active_player_id = sender_id 
-                    if sender_id != self.id:
-                        print(f"\n [INFO] {sender_id} announced: {event.get('value')}")
-                # EVENT 4: Someone lost, round over
-                elif event['type'] == 'ROUND_OVER':
-                    if event.get('round_id') == self.round_id:
-                        self._handle_round_over(event)
-                # EVENT 5: Player left lost connection
-                elif event['type'] == 'PLAYER_LEFT':
-                    self._handle_player_left(event['dropout'])
-
+                # Cancel a voided decision or act on an expired one before waiting again
+                self._check_decision()
+                self._handle_event(self.ui_queue.get())
             except KeyboardInterrupt: break
 
+    def _handle_event(self, event):
+        '''One event of the game loop'''
+        # EVENT 0: A line typed by the player, answers the open decision
+        if event['type'] == 'INPUT':
+            self._answer_decision(event['text'])
+            return
+        # Deadline timer of a decision fired, _check_decision of the loop runs its default
+        if event['type'] == 'DECISION_DEADLINE':
+            return
+        # The cup could not be passed, try again
+        if event['type'] == 'PASS_RETRY':
+            if event['token'].get('round_id') == self.round_id:
+                self._pass_token(event['token'])
+            return
+        # If spectator nothing to do
+        if self.is_spectator and event['type'] in ['MY_TURN_START', 'TOKEN_RCV']:
+            return
+        # EVENT 1: MY TURN
+        if event['type'] == 'MY_TURN_START':
+            self.active_player_id = self.id
+            self._do_turn(event.get('first_round', False), event.get('prev_claim', 0))
+        # EVENT 2: Get dices from previouse player. 'Becher bekommen in der Bar'
+        elif event['type'] == 'TOKEN_RCV':
+            self.active_player_id = self.id 
+            self._handle_incoming_token(event['token'])
+        # EVENT 3: Someone anounced a value
+        elif event['type'] == 'ANNOUNCE':
+            sender_id = event.get('sender_id')
+            if sender_id not in self.alive_players: return
+            if event.get('round_id') != self.round_id: return
+            
+            self.active_player_id = sender_id 
+            if sender_id != self.id:
+                print(f"\n [INFO] {sender_id} announced: {event.get('value')}")
+        # EVENT 4: Someone lost, round over
+        elif event['type'] == 'ROUND_OVER':
+            if event.get('round_id') == self.round_id:
+                self._handle_round_over(event)
+        # EVENT 5: Player left lost connection
+        elif event['type'] == 'PLAYER_LEFT':
+            self._handle_player_left(event['dropout'])
+        # EVENT 6: Our liveness check found a dropout, tell the others (reliable, so later messages carry copies)
+        elif event['type'] == 'DROPOUT_DETECTED':
+            if event['dropout'] in self.alive_players:
+                self._send_reliable_broadcast({'type': 'PLAYER_LEFT', 'dropout': event['dropout']})
+            self._handle_player_left(event['dropout'])
+        # EVENT 7: The pause after a dropout is over, start the new round
+        elif event['type'] == 'RECOVERY':
+            self._start_recovery_turn(event)
+
     def _handle_player_left(self, dropout_id):
+        # Detected locally and announced by others, only the first one counts
         if dropout_id not in self.final_player_list: return
+        if dropout_id not in self.alive_players: return
         
-        if dropout_id in self.alive_players:
-            self.alive_players.remove(dropout_id)
+        self.alive_players.remove(dropout_id)
         
         self.scores[dropout_id] = self.max_strikes
         print(f"\n[!] Player {dropout_id} ELIMINATED (Connection Lost).")
@@ -368,7 +451,7 @@ class PeerNode:
         self.round_id += 1 
 
         if not self.is_spectator and self.neighbor_id == dropout_id:
-            print(f" [Network] Neighbor {dropout_id} gone. Repairing ring...")
+            ring_log.info("neighbor gone, repairing ring", neighbor=dropout_id)
             if self.neighbor_sock:
                 try: self.neighbor_sock.close()
                 except: pass
@@ -401,80 +484,110 @@ class PeerNode:
             if successor == self.id:
                 print(f"\n[!] RECOVERY: It is YOUR turn to start a new round. Press ENTER to continue.")
                 self.turn_state = "IDLE"
-                time.sleep(1.0)
-                
-                while not self.ui_queue.empty():
-                    try: self.ui_queue.get_nowait()
-                    except: break
-                
-                self.ui_queue.put({
-                    'type': 'MY_TURN_START', 
-                    'first_round': True, 
-                    'prev_claim': 0,
-                    'round_id_sync': self.round_id
-                })
+                self.timers.call_later(1.0, self.ui_queue.put, {'type': 'RECOVERY', 'round_id': self.round_id})
             else:
                 print(f"[!] Waiting for {successor} to start new round...")
         
         self._print_scoreboard()
 
+    def _start_recovery_turn(self, event):
+        '''
+        A second after a dropout drop the stale events of the voided round and start the new one.
+        Dropout reports are kept: they are handled first and this event queued again behind them.
+        '''
+        if event['round_id'] != self.round_id: return
+        kept = []
+        while True:
+            try: stale = self.ui_queue.get_nowait()
+            except queue.Empty: break
+            if stale['type'] in ('PLAYER_LEFT', 'DROPOUT_DETECTED'): kept.append(stale)
+        if kept:
+            for pending in kept + [event]: self.ui_queue.put(pending)
+            return
+        
+        self.ui_queue.put({
+            'type': 'MY_TURN_START', 
+            'first_round': True, 
+            'prev_claim': 0,
+            'round_id_sync': self.round_id
+        })
+
+    def _post_turn_start(self, round_id):
+        '''Timer callback, starts the next round unless it was voided in the meantime'''
+        if round_id != self.round_id: return
+        self.ui_queue.put({'type': 'MY_TURN_START', 'first_round': True, 'prev_claim': 0})
+
     def _handle_incoming_token(self, token):
         sender_id = token.get('sender_id')
         if sender_id == self.id: return
         
         if sender_id not in self.alive_players: 
-            print("[!] Ignoring token from dead player.")
+            ring_log.warning("ignoring token from dead player", sender=sender_id)
             return
 
         announced_val = token['announced']
         print(f"\n[INCOMING] Claim: {announced_val}")
 
-        def is_sender_still_valid():
+        prev_claim = token.get('prev_claim', 0)
+        if self.show_hints and (prev_claim, announced_val) in ODDS.advice:
+            print(ODDS.hint(prev_claim, announced_val))
+
+        def void_reason():
             if sender_id not in self.alive_players:
-                print("\n[!] Sender died while you were deciding. Turn VOID.")
-                return False
+                return "Sender died while you were deciding. Turn VOID."
             if token.get('round_id') != self.round_id:
-                print("\n[!] Round ID changed (Recovery happened). Turn VOID.")
-                return False
-            return True
+                return "Round ID changed (Recovery happened). Turn VOID."
+            return None
+
+        # Nobody answered in time, take the cheaper option according to the odds tables
+        default = ODDS.advice.get((prev_claim, announced_val), 'n')
 
         if announced_val == 21:
             print(f"[!!!] MÄXLE (21) ANNOUNCED by {sender_id}!")
             print("      Options: (y) Trust, (n) Check")
-            
-            while True:
-                cmd = input(">> Decision (y/n)? ").lower()
-                if cmd in ['y', 'n']: break
-            
-            if not is_sender_still_valid(): return
+            self._ask(Decision(
+                ">> Decision (y/n)? ", parse_yes_no,
+                lambda cmd: self._resolve_maxle(token, cmd),
+                timeout=DECISION_TIMEOUT, on_expire=lambda: self._resolve_maxle(token, default),
+                void_reason=void_reason
+            ))
+            return
 
-            real = token['security']['hidden_real']
-            
-            if cmd == 'y':
+        self._ask(Decision(
+            ">> Trust (y) or Check (n)? ", parse_yes_no,
+            lambda cmd: self._resolve_claim(token, cmd),
+            timeout=DECISION_TIMEOUT, on_expire=lambda: self._resolve_claim(token, default),
+            void_reason=void_reason
+        ))
+
+    def _resolve_maxle(self, token, cmd):
+        sender_id = token.get('sender_id')
+        real = token['security']['hidden_real']
+        
+        if cmd == 'y':
+            loser = self.id
+            points = 1
+            print(f"   [ACCEPTED] You took the hit. Real was: {real}")
+        else:
+            if real == 21:
                 loser = self.id
-                points = 1
-                print(f"   [ACCEPTED] You took the hit. Real was: {real}")
+                points = 2
+                print(f"   [FAILED CHECK] It was a MÄXLE! You take 2 strikes.")
             else:
-                if real == 21:
-                    loser = self.id
-                    points = 2
-                    print(f"   [FAILED CHECK] It was a MÄXLE! You take 2 strikes.")
-                else:
-                    loser = sender_id
-                    points = 2
-                    print(f"   [BUSTED] {sender_id} lied! They take 2 strikes. Real: {real}")
-            
-            round_over_msg = {
-                'type': 'ROUND_OVER', 'loser': loser, 'real_value': real,
-                'points': points, 'round_id': self.round_id
-            }
-            self._send_reliable_broadcast(round_over_msg)
-            self.ui_queue.put(round_over_msg)
-            return
-
-        cmd = input(">> Trust (y) or Check (n)? ").lower()
+                loser = sender_id
+                points = 2
+                print(f"   [BUSTED] {sender_id} lied! They take 2 strikes. Real: {real}")
         
-        if not is_sender_still_valid(): return
+        round_over_msg = {
+            'type': 'ROUND_OVER', 'loser': loser, 'real_value': real,
+            'points': points, 'round_id': self.round_id
+        }
+        self._send_reliable_broadcast(round_over_msg)
+        self.ui_queue.put(round_over_msg)
+
+    def _resolve_claim(self, token, cmd):
+        sender_id = token.get('sender_id')
+        announced_val = token['announced']
 
         if cmd == 'n':
             real = token['security']['hidden_real']
@@ -543,34 +656,54 @@ class PeerNode:
         
         if next_p == self.id and not self.is_spectator:
             print("\n[!] Your turn to start next round.")
-            time.sleep(2)
-            self.ui_queue.put({'type': 'MY_TURN_START', 'first_round': True, 'prev_claim': 0})
+            self.timers.call_later(2.0, self._post_turn_start, self.round_id)
         else:
             print(f"\n[!] Waiting for {next_p}...")
 
     def _do_turn(self, first_round, prev_claim):
         '''
         Your turn. Roll the dice, anounce, give the cup with dices to the next player in the ring.
+        Every step waits for input as a Decision, so the game loop keeps running meanwhile.
         '''
         if self.is_spectator: return 
         print("\n--- YOUR TURN ---")
         
-        if not first_round: 
-            input(">> Press ENTER to roll dice...")
-            
+        min_val = prev_claim if not first_round else 0
+        round_id = self.round_id
+        if first_round:
+            self._roll_and_announce(min_val, round_id)
+            return
+
+        self._ask(Decision(
+            ">> Press ENTER to roll dice...", str,
+            lambda _: self._roll_and_announce(min_val, round_id),
+            timeout=DECISION_TIMEOUT, on_expire=lambda: self._roll_and_announce(min_val, round_id),
+            void_reason=lambda: self._turn_void_reason(round_id)
+        ))
+
+    def _roll_and_announce(self, min_val, round_id):
         val = self.game_engine.roll_dice()
         print(f"   [HIDDEN ROLL] {val}")
-        
-        while True:
-            try:
-                min_val = prev_claim if not first_round else 0
-                
-                claim = int(input(f">> Announce (> {min_val}): "))
-                is_valid, err = self.game_engine.validate_announcement(claim, min_val)
-                if is_valid: break
-                print(f"   [!] {err}")
-            except: pass
 
+        def parse_claim(text):
+            try: claim = int(text)
+            except ValueError: raise ValueError("")
+            is_valid, err = self.game_engine.validate_announcement(claim, min_val)
+            if not is_valid: raise ValueError(err)
+            return claim
+
+        # Nobody answered in time, announce the roll if it is enough, else the lowest valid claim
+        if self.game_engine.is_higher(val, min_val): default = val
+        else: default = next(v for v in self.game_engine.order if self.game_engine.is_higher(v, min_val))
+
+        self._ask(Decision(
+            f">> Announce (> {min_val}): ", parse_claim,
+            lambda claim: self._announce_and_pass(val, claim, min_val),
+            timeout=DECISION_TIMEOUT, on_expire=lambda: self._announce_and_pass(val, default, min_val),
+            void_reason=lambda: self._turn_void_reason(round_id)
+        ))
+
+    def _announce_and_pass(self, val, claim, min_val):
         self._send_reliable_broadcast({
             'type': 'ANNOUNCE', 
             'value': claim, 
@@ -580,21 +713,83 @@ class PeerNode:
         
         token = self.game_engine.secure_cup(val, claim)
         token['round_id'] = self.round_id
+        token['prev_claim'] = min_val
+        self._pass_token(token)
+
+    def _pass_token(self, token):
+        '''
+        Hand the cup to the ring neighbour. On failure the connection is rebuilt and a
+        PASS_RETRY event is scheduled, the game loop keeps running in between.
+        '''
+        if not (self.running and self.game_running): return
+        if len(self.alive_players) < 2: return
+
+        if self._send_tcp_token_with_ack(token):
+            return 
+        
+        if self.neighbor_sock:
+            ring_log.warning("passing the cup failed, retrying", neighbor=self.neighbor_id, delay=TOKEN_RETRY_DELAY)
+            try: self.neighbor_sock.close()
+            except: pass
+            self.neighbor_sock = None
         
-        while self.running and self.game_running:
-            if len(self.alive_players) < 2: return
+        self._connect_to_next_neighbor()
+        self.timers.call_later(TOKEN_RETRY_DELAY, self.ui_queue.put, {'type': 'PASS_RETRY', 'token': token})
+
+    def _turn_void_reason(self, round_id):
+        if self.is_spectator: return "You are out. Turn VOID."
+        if round_id != self.round_id: return "Round ID changed (Recovery happened). Turn VOID."
+        return None
+
+    def _on_input_line(self, line):
+        '''Called by the input thread for every line, the game loop handles it as event'''
+        self.ui_queue.put({'type': 'INPUT', 'text': line})
+
+    def _ask(self, decision):
+        '''Open a decision, the answer arrives later as INPUT event. Replaces an older open one.'''
+        self._close_decision()
+        self.decision = decision
+        if decision.deadline is not None:
+            decision.timer = self.timers.call_later(
+                decision.remaining(), self.ui_queue.put, {'type': 'DECISION_DEADLINE', 'decision_id': decision.id}
+            )
+        print(decision.prompt, end="", flush=True)
+
+    def _close_decision(self):
+        decision = self.decision
+        self.decision = None
+        if decision and decision.timer: decision.timer.cancel()
+
+    def _answer_decision(self, text):
+        decision = self.decision
+        if decision is None: return
+        if self._check_decision(): return
+        try: answer = decision.parse(text)
+        except ValueError as e:
+            if str(e): print(f"   [!] {e}")
+            print(decision.prompt, end="", flush=True)
+            return
+        self._close_decision()
+        decision.on_answer(answer)
 
-            if self._send_tcp_token_with_ack(token):
-                return 
-            
-            if self.neighbor_sock:
-                print(f"[!] Connection failed with {self.neighbor_id}. Retrying...")
-                try: self.neighbor_sock.close()
-                except: pass
-                self.neighbor_sock = None
-            
-            self._connect_to_next_neighbor()
-            time.sleep(2)
+    def _check_decision(self):
+        '''
+        Cancel the open decision if it was voided, run its default if it expired.
+        Returns True if the decision was closed.
+        '''
+        decision = self.decision
+        if decision is None: return False
+        reason = decision.void_reason()
+        if reason:
+            self._close_decision()
+            print(f"\n[!] {reason}")
+            return True
+        if decision.expired():
+            self._close_decision()
+            print("\n[!] Time is up.")
+            if decision.on_expire: decision.on_expire()
+            return True
+        return False
 
     def _send_tcp_token_with_ack(self, token):
         if self.is_spectator: return False
@@ -605,14 +800,14 @@ class PeerNode:
         msg = json.dumps({'type': 'TOKEN', 'payload': token}) + "\n"
         try:
             self.neighbor_sock.sendall(msg.encode())
-            print(f">> Cup passed to {self.neighbor_id}...")
+            ring_log.info("cup passed", to=self.neighbor_id, round=token.get('round_id'))
             
             response_bytes = self.neighbor_sock.recv(1024)
             if not response_bytes: return False
             response = json.loads(response_bytes.decode())
             
             if response.get('status') == 'REJECTED':
-                print(f"[!] Peer REJECTED the cup: {response.get('reason')}")
+                ring_log.warning("peer rejected the cup", neighbor=self.neighbor_id, reason=response.get('reason'))
                 return False
             
             return response.get('type') == 'ACK'
@@ -621,83 +816,169 @@ class PeerNode:
 
     def _listen_udp(self):
         '''
-        Listens to UDP handles broadcast and reliable ulticast when the packet has a sequence number
-        UDP messages can be, HEARTBEAT, HELLO, NACK, and RELIABLE MUTLICAST (if packet has seq)
+        Receive stage of the UDP pipeline. Wakes up when the socket is readable and drains
+        it non-blocking in batches, so a burst of heartbeats leaves the kernel buffer at once.
+        Datagrams of other groups are dropped by their tag before any JSON is decoded,
+        decoded batches go to the ordering stage (_process_udp) via the bounded rx_queue.
         '''
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try: s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        except OSError: pass
         try: s.bind(('', BROADCAST_PORT))
         except: return
-        
+        if self.multicast_group:
+            net_discovery.join_multicast(s, self.multicast_group, self.interfaces)
+        self._receive_loop(s)
+
+    def _receive_loop(self, s):
+        s.setblocking(False)
+        buf = bytearray(BUF_SIZE)
+        view = memoryview(buf)
         while self.running:
+            batch = []
             try:
-                data, addr = s.recvfrom(BUF_SIZE)
-                msg = json.loads(data.decode())
-                if msg.get('group') != self.group_hash: continue
-                
-                sid = msg.get('sender_id')
-                sip = msg.get('sender_ip', addr[0])
-                if sid == self.id: continue
-                
-                self.peer_last_seen[sid] = time.time()
-                if sid not in self.peers or self.peers[sid] != sip:
-                    self.peers[sid] = sip
+                readable, _, _ = select.select([s], [], [], 1.0)
+                if not readable: continue
+                for _ in range(UDP_BATCH_SIZE):
+                    try: n, addr = s.recvfrom_into(buf)
+                    except BlockingIOError: break
+                    # One broken datagram must not cost the rest of the batch
+                    try: msg = self._decode_datagram(view[:n].tobytes(), addr)
+                    except Exception as e:
+                        self.rx_dropped += 1
+                        net_log.debug("datagram dropped", error=repr(e), ip=addr[0])
+                        continue
+                    if msg is not None: batch.append((msg, addr))
+            except (OSError, ValueError) as e:
+                # Only a closed socket ends the loop, other errors (e.g. ICMP reports) are transient
+                if not self.running or s.fileno() == -1 or getattr(e, 'errno', None) == errno.EBADF: return
+                net_log.warning("udp receive error", error=repr(e))
+            if not batch: continue
+            try: self.rx_queue.put_nowait(batch)
+            except queue.Full:
+                # Ordering stage is behind, heartbeats come again and reliable messages via NACK
+                self.rx_dropped += len(batch)
+                net_log.debug("rx queue full, batch dropped", size=len(batch), total=self.rx_dropped)
+
+    def _process_udp(self):
+        '''Ordering stage of the UDP pipeline, applies decoded messages in arrival order'''
+        while self.running:
+            try: batch = self.rx_queue.get(timeout=1.0)
+            except queue.Empty: continue
+            for msg, addr in batch:
+                try: self._dispatch_message(msg, addr)
+                except: pass
 
-                if msg['type'] == 'HEARTBEAT':
-                    if msg.get('state') == 'RUNNING':
-                        self.game_running = True 
-                        
-                        if 'scores' in msg:
-                            remote_scores = msg['scores']
-                            for p, score in remote_scores.items():
-                                if self.is_spectator or score > self.scores.get(p, 0):
-                                    self.scores[p] = score
-
-                        if self.is_spectator or not self.final_player_list:
-                            if 'round_id' in msg and msg['round_id'] > self.round_id:
-                                self.round_id = msg['round_id']
-                            
-                            if 'players' in msg:
-                                self.alive_players = msg['players']
-                                if not self.final_player_list:
-                                    self.final_player_list = self.alive_players
-                                    
-                                    for p in self.final_player_list:
-                                        if p not in self.scores: self.scores[p] = 0
-                    continue
-
-                if msg['type'] == 'HELLO':
-                    for friend_id in msg.get('known_peers', []):
-                        if friend_id != self.id and friend_id not in self.peers:
-                            self.peers[friend_id] = None 
-                    continue
-
-                if msg['type'] == 'NACK':
-                    self._handle_nack(msg['req_seq'])
-                    continue
-
-                if 'seq' not in msg: continue
-
-                seq = msg['seq']
-                expected = self.remote_seqs.get(sid, 0) + 1
-
-                if seq == expected:
-                    self.remote_seqs[sid] = seq
-                    self.ui_queue.put(msg)
-                    while True:
-                        next_seq = self.remote_seqs[sid] + 1
-                        if sid in self.holdback_queue and next_seq in self.holdback_queue[sid]:
-                            queued_msg = self.holdback_queue[sid].pop(next_seq)
-                            self.remote_seqs[sid] = next_seq
-                            self.ui_queue.put(queued_msg)
-                        else: break
+    def _decode_datagram(self, data, addr):
+        '''
+        Returns the message, or None if the datagram belongs to another group, is broken
+        or is a fragment of a message that is not complete yet
+        '''
+        payload = self.reassembler.feed(data, addr)
+        if payload is None: return None
+        try: return json.loads(payload)
+        except ValueError:
+            self.rx_dropped += 1
+            return None
+
+    def _process_datagram(self, data, addr):
+        '''Decode and apply one datagram on the calling thread'''
+        msg = self._decode_datagram(data, addr)
+        if msg is not None: self._dispatch_message(msg, addr)
+
+    def _dispatch_message(self, msg, addr):
+        '''
+        Apply one decoded message: peer table, heartbeat state, NACKs and
+        ordering of reliable messages via the holdback queue.
+        '''
+        sid = msg.get('sender_id')
+        sip = addr[0]
+        if sid == self.id: return
+        net_log.debug("rx", type=msg.get('type'), sender=sid, seq=msg.get('seq'))
+        
+        self.peer_last_seen[sid] = time.monotonic()
+        if sid not in self.peers or self.peers[sid] != sip:
+            self.peers[sid] = sip
+
+        if msg['type'] == 'HEARTBEAT':
+            if msg.get('state') == 'RUNNING' and not self.discovery_done.is_set():
+                self.discovery_done.set()
+            # Only players of our game (see _expect_all_players), a late joiner would NACK the whole history
+            if sid in self.remote_seqs:
+                for copy in msg.get('redundant', []):
+                    copy.setdefault('sender_id', sid)
+                    self._deliver_reliable(sid, copy)
+
+            if msg.get('state') == 'RUNNING':
+                self.game_running = True 
                 
-                elif seq > expected:
-                    if sid not in self.holdback_queue: self.holdback_queue[sid] = {}
-                    self.holdback_queue[sid][seq] = msg
-                    for missing in range(expected, seq):
-                        self._send_nack(sid, missing)
-            except: pass
+                if 'scores' in msg:
+                    remote_scores = msg['scores']
+                    for p, score in remote_scores.items():
+                        if self.is_spectator or score > self.scores.get(p, 0):
+                            self.scores[p] = score
+
+                if self.is_spectator or not self.final_player_list:
+                    if 'round_id' in msg and msg['round_id'] > self.round_id:
+                        self.round_id = msg['round_id']
+                    
+                    if 'players' in msg:
+                        self.alive_players = msg['players']
+                        if not self.final_player_list:
+                            self.final_player_list = self.alive_players
+                            
+                            for p in self.final_player_list:
+                                if p not in self.scores: self.scores[p] = 0
+            return
+
+        if msg['type'] == 'HELLO':
+            for friend_id in msg.get('known_peers', []):
+                if friend_id != self.id and friend_id not in self.peers:
+                    self.peers[friend_id] = None 
+            return
+
+        if msg['type'] == 'NACK':
+            if msg.get('target_id') == self.id:
+                net_log.debug("nack received", sender=sid, seq=msg['req_seq'])
+                self._handle_nack(msg['req_seq'])
+            return
+
+        if 'seq' not in msg: return
+
+        # Older messages first, so they close the gap before this one is ordered
+        for copy in msg.pop('redundant', []):
+            copy.setdefault('sender_id', sid)
+            self._deliver_reliable(sid, copy)
+        self._deliver_reliable(sid, msg)
+
+    def _deliver_reliable(self, sid, msg):
+        '''
+        Reliable ordered delivery per sender. Messages in order go to the ui_queue,
+        early ones wait in the holdback queue and the gap is NACKed, duplicates are dropped.
+        '''
+        seq = msg['seq']
+        expected = self.remote_seqs.get(sid, 0) + 1
+
+        if seq == expected:
+            self.remote_seqs[sid] = seq
+            self.ui_queue.put(msg)
+            while True:
+                next_seq = self.remote_seqs[sid] + 1
+                if sid in self.holdback_queue and next_seq in self.holdback_queue[sid]:
+                    queued_msg = self.holdback_queue[sid].pop(next_seq)
+                    self.remote_seqs[sid] = next_seq
+                    self.ui_queue.put(queued_msg)
+                else: break
+        
+        elif seq > expected:
+            if sid not in self.holdback_queue: self.holdback_queue[sid] = {}
+            held = self.holdback_queue[sid]
+            if seq in held: return
+            held[seq] = msg
+            for missing in range(expected, seq):
+                if missing not in held and (sid, missing) not in self.nack_timers:
+                    self._send_nack(sid, missing)
 
     def _listen_tcp(self):
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -726,7 +1007,7 @@ class PeerNode:
                             reason = f"Round Mismatch (Msg:{token.get('round_id')} != Me:{self.round_id})"
                         
                         if reason:
-                            print(f"\n[DEBUG] REJECTED TOKEN: {reason}")
+                            ring_log.info("rejected token", sender=sender, reason=reason)
                             conn.sendall(json.dumps({'type': 'ACK', 'status': 'REJECTED', 'reason': reason}).encode())
                         else:
                             conn.sendall(json.dumps({'type': 'ACK', 'status': 'OK'}).encode())
@@ -742,34 +1023,79 @@ class PeerNode:
             status = "ALIVE" if p in self.alive_players else "DEAD"
             print(f" {p}: {score}/{self.max_strikes} [{status}]")
         print("------------------")
+        game_log.info("scoreboard", round=self.round_id, scores=dict(self.scores), alive=list(self.alive_players))
 
     def _send_reliable_broadcast(self, msg):
-        '''Create reliable broadcast message. Message + Sequence number + save for retransmission'''
-        self.my_seq += 1
-        msg['seq'] = self.my_seq
-        self.msg_history.append(msg)
-        self._send_unreliable_broadcast(msg)
+        '''
+        Create reliable broadcast message. Message + Sequence number + save for retransmission.
+        The datagram also carries copies of the previous fec_depth messages, so a receiver that
+        lost one of them repairs it from this datagram without a NACK round trip.
+        '''
+        with self.history_lock:
+            self.my_seq += 1
+            msg['seq'] = self.my_seq
+            # Complete before other threads can see it in the history (FEC copies, NACK answers)
+            msg['sender_id'] = self.id
+            redundant = self._recent_reliable(self.fec_depth)
+            self.msg_history.append(msg)
+            self.last_reliable_sent = time.monotonic()
+
+        if not redundant:
+            self._send_unreliable_broadcast(msg)
+            return
+        out = dict(msg)
+        out['redundant'] = redundant
+        self._send_unreliable_broadcast(out)
+
+    def _recent_reliable(self, count):
+        '''Last count messages of the history, oldest first'''
+        if count <= 0: return []
+        with self.history_lock:
+            return list(self.msg_history)[-count:]
 
     def _send_unreliable_broadcast(self, msg):
-        msg.update({'group': self.group_hash, 'sender_id': self.id, 'sender_ip': self.my_ip})
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-            s.sendto(json.dumps(msg).encode(), (self.broadcast_ip, BROADCAST_PORT))
-        except: pass
+        try: datagrams = self._encode_message(msg)
+        except ValueError: return  # above MAX_MESSAGE_SIZE even after compression
+        for data in datagrams:
+            self._send_datagram(data)
+
+    def _send_datagram(self, data):
+        for _, s, target in self.send_links:
+            try: s.sendto(data, (target, BROADCAST_PORT))
+            except OSError: pass
+
+    def _encode_message(self, msg):
+        '''
+        Stamp sender on the message and serialize it into datagrams, compressed and
+        fragmented by the FrameEncoder if it is large.
+        The sender IP is not sent, receivers take the source address of the datagram,
+        which is the right one for the interface it arrived on.
+        '''
+        msg['sender_id'] = self.id
+        return self.encoder.encode(json.dumps(msg).encode())
 
     def _handle_nack(self, req_seq):
         '''
         Some one is sending NACK -> so message is missing -> try to retransmit via seq
         '''
-        for stored_msg in self.msg_history:
-            if stored_msg['seq'] == req_seq:
-                self._send_unreliable_broadcast(stored_msg) 
-                return
+        with self.history_lock:
+            stored = next((m for m in self.msg_history if m['seq'] == req_seq), None)
+        if stored: self._send_unreliable_broadcast(stored)
 
-    def _send_nack(self, target_id, missing_seq):
+    def _send_nack(self, target_id, missing_seq, attempt=1):
         '''
         When message is missing ask for retransmission via NACK
+        A timer asks again after NACK_TIMEOUT, up to NACK_RETRIES times
         '''
         nack = {'type': 'NACK', 'req_seq': missing_seq, 'target_id': target_id}
-        self._send_unreliable_broadcast(nack)
\ No newline at end of file
+        net_log.debug("nack sent", target=target_id, seq=missing_seq, attempt=attempt)
+        self._send_unreliable_broadcast(nack)
+        if attempt < NACK_RETRIES:
+            self.nack_timers[(target_id, missing_seq)] = self.timers.call_later(
+                NACK_TIMEOUT, self._retry_nack, target_id, missing_seq, attempt + 1
+            )
+
+    def _retry_nack(self, target_id, missing_seq, attempt):
+        self.nack_timers.pop((target_id, missing_seq), None)
+        if self.remote_seqs.get(target_id, 0) >= missing_seq: return  # arrived in the meantime
+        self._send_nack(target_id, missing_seq, attempt)
\ No newline at end of file
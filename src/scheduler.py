@@ -0,0 +1,130 @@
+# scheduler.py
+
+import threading
+import time
+
+
+class Timer:
+    '''Handle of a scheduled callback, cancel() stops it (also a repeating one)'''
+    __slots__ = ('fn', 'args', 'deadline', 'interval', 'tick', 'cancelled', 'wheel')
+
+    def __init__(self, wheel, fn, args, deadline, interval):
+        self.wheel = wheel
+        self.fn = fn
+        self.args = args
+        self.deadline = deadline
+        self.interval = interval
+        self.tick = 0
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        self.wheel._remove(self)
+
+
+class TimerWheel:
+    '''
+    Hashed timer wheel on the monotonic clock, one thread runs every timer of the node.
+    A timer lands in slot (due tick % slots), so scheduling and cancelling are O(1).
+    The thread sleeps until the next slot that holds a due timer instead of waking
+    every tick, and catches up on all ticks it slept through.
+    Callbacks run on the timer thread and must be short, longer work goes to a queue.
+    '''
+    def __init__(self, tick=0.01, slots=512):
+        self.tick = tick
+        self.slots = [set() for _ in range(slots)]
+        self.start_time = time.monotonic()
+        self.current_tick = 0
+        self.pending = 0
+        self.cond = threading.Condition()
+        self.running = False
+        self._thread = None
+
+    def start(self):
+        with self.cond:
+            if self.running: return
+            self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    def call_later(self, delay, fn, *args):
+        '''Run fn(*args) once after delay seconds'''
+        return self._add(Timer(self, fn, args, time.monotonic() + delay, None))
+
+    def call_every(self, interval, fn, *args, first=None):
+        '''Run fn(*args) every interval seconds, the first time after first (default interval)'''
+        delay = interval if first is None else first
+        return self._add(Timer(self, fn, args, time.monotonic() + delay, interval))
+
+    def _tick_of(self, deadline):
+        # Round up, a timer never fires early
+        ticks = (deadline - self.start_time) / self.tick
+        return int(ticks) + (ticks > int(ticks))
+
+    def _add(self, timer):
+        with self.cond:
+            # A repeating timer is in no slot while it runs, a cancel() meanwhile only set the flag
+            if timer.cancelled: return timer
+            timer.tick = max(self._tick_of(timer.deadline), self.current_tick + 1)
+            self.slots[timer.tick % len(self.slots)].add(timer)
+            self.pending += 1
+            self.cond.notify()
+        return timer
+
+    def _remove(self, timer):
+        with self.cond:
+            bucket = self.slots[timer.tick % len(self.slots)]
+            if timer in bucket:
+                bucket.remove(timer)
+                self.pending -= 1
+
+    def _next_wait(self):
+        '''Seconds until the next slot with a due timer, None if there are no timers'''
+        if not self.pending: return None
+        n = len(self.slots)
+        for ahead in range(1, n + 1):
+            tick = self.current_tick + ahead
+            if any(t.tick <= tick for t in self.slots[tick % n]):
+                break
+        return max(0.0, self.start_time + tick * self.tick - time.monotonic())
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if not self.running: return
+                wait = self._next_wait()
+                if wait is None or wait > 0:
+                    self.cond.wait(wait)
+                    if not self.running: return
+                due = self._advance()
+            for timer in due:
+                if timer.cancelled: continue
+                try: timer.fn(*timer.args)
+                except Exception: pass
+                if timer.interval is not None:
+                    # Keep the rhythm, but do not fire a burst after a stall, _add skips it if cancelled
+                    timer.deadline = max(timer.deadline + timer.interval, time.monotonic())
+                    self._add(timer)
+
+    def _advance(self):
+        '''Walk all ticks up to now and collect the timers that are due, called with the lock held'''
+        now_tick = int((time.monotonic() - self.start_time) / self.tick)
+        n = len(self.slots)
+        due = []
+        # More than one rotation behind means every slot has been visited
+        last = min(now_tick, self.current_tick + n)
+        for tick in range(self.current_tick + 1, last + 1):
+            bucket = self.slots[tick % n]
+            if not bucket: continue
+            for timer in [t for t in bucket if t.tick <= now_tick]:
+                bucket.remove(timer)
+                self.pending -= 1
+                due.append(timer)
+        self.current_tick = max(self.current_tick, now_tick)
+        due.sort(key=lambda t: t.deadline)
+        return due
@@ -0,0 +1,126 @@
+# wire.py
+
+import itertools
+import os
+import struct
+import time
+import zlib
+
+# Datagram layout: group tag | flags (1 byte) | [msg_id, index, count if FRAGMENT] | payload
+FLAG_COMPRESSED = 0x01
+FLAG_FRAGMENT = 0x02
+FRAGMENT_HEADER = struct.Struct('!IHH')
+
+COMPRESS_THRESHOLD = 512  # smaller payloads are not worth the CPU
+MAX_DATAGRAM = 1200  # stays below the 1500 byte Ethernet MTU, so IP never has to fragment
+MAX_MESSAGE_SIZE = 1 << 20  # limit for reassembled and decompressed messages
+MAX_FRAGMENTS = 1024
+MAX_PENDING = 32  # messages in reassembly at the same time, the oldest is dropped beyond
+REASSEMBLY_TIMEOUT = 2.0
+
+
+class FrameEncoder:
+    '''Turns one payload into one or more datagrams, compressed if that pays off'''
+    def __init__(self, tag, max_datagram=MAX_DATAGRAM, compress_threshold=COMPRESS_THRESHOLD):
+        self.tag = tag
+        self.max_datagram = max_datagram
+        self.compress_threshold = compress_threshold
+        # Random start, so a restarted node does not reuse ids still in reassembly elsewhere
+        self.msg_ids = itertools.count(int.from_bytes(os.urandom(4), 'big'))
+
+    def encode(self, payload):
+        flags = 0
+        if len(payload) > self.compress_threshold:
+            packed = zlib.compress(payload, 6)
+            if len(packed) < len(payload):
+                payload = packed
+                flags |= FLAG_COMPRESSED
+
+        head = self.tag + bytes([flags])
+        if len(head) + len(payload) <= self.max_datagram:
+            return [head + payload]
+
+        chunk = self.max_datagram - len(head) - FRAGMENT_HEADER.size
+        count = -(-len(payload) // chunk)
+        if count > MAX_FRAGMENTS:
+            raise ValueError(f"Message too large ({len(payload)} bytes)")
+        msg_id = next(self.msg_ids) & 0xFFFFFFFF
+        head = self.tag + bytes([flags | FLAG_FRAGMENT])
+        return [
+            head + FRAGMENT_HEADER.pack(msg_id, i, count) + payload[i * chunk:(i + 1) * chunk]
+            for i in range(count)
+        ]
+
+
+class Reassembler:
+    '''
+    Inverse of FrameEncoder for one receiving socket. feed() returns the payload once a
+    message is complete, None otherwise. Datagrams of other groups are dropped by their tag
+    before anything else. Incomplete messages are dropped after REASSEMBLY_TIMEOUT,
+    and at most MAX_PENDING of them are kept.
+    '''
+    def __init__(self, tag, timeout=REASSEMBLY_TIMEOUT, max_pending=MAX_PENDING):
+        self.tag = tag
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.pending = {}  # (source, msg_id) -> [first_seen, count, {index: chunk}, size]
+        self.dropped = 0
+
+    def feed(self, data, source, now=None):
+        if not data.startswith(self.tag): return None
+        pos = len(self.tag)
+        if len(data) <= pos: return None
+        flags = data[pos]
+        pos += 1
+
+        if not flags & FLAG_FRAGMENT:
+            return self._finish(flags, data[pos:])
+
+        if len(data) < pos + FRAGMENT_HEADER.size: return None
+        msg_id, index, count = FRAGMENT_HEADER.unpack_from(data, pos)
+        if count == 0 or count > MAX_FRAGMENTS or index >= count: return None
+        chunk = data[pos + FRAGMENT_HEADER.size:]
+
+        now = now or time.monotonic()
+        self._expire(now)
+        key = (source, msg_id)
+        entry = self.pending.get(key)
+        if entry is None:
+            if len(self.pending) >= self.max_pending:
+                self.pending.pop(next(iter(self.pending)))
+                self.dropped += 1
+            entry = self.pending[key] = [now, count, {}, 0]
+        if entry[1] != count: return None
+
+        parts = entry[2]
+        if index in parts: return None
+        parts[index] = chunk
+        entry[3] += len(chunk)
+        if entry[3] > MAX_MESSAGE_SIZE:
+            del self.pending[key]
+            self.dropped += 1
+            return None
+        if len(parts) < count: return None
+
+        del self.pending[key]
+        return self._finish(flags, b''.join(parts[i] for i in range(count)))
+
+    def _finish(self, flags, payload):
+        if not flags & FLAG_COMPRESSED: return payload
+        d = zlib.decompressobj()
+        try: out = d.decompress(payload, MAX_MESSAGE_SIZE)
+        except zlib.error:
+            self.dropped += 1
+            return None
+        if d.unconsumed_tail:  # larger than MAX_MESSAGE_SIZE
+            self.dropped += 1
+            return None
+        return out
+
+    def _expire(self, now):
+        # Insertion order is arrival order, so the oldest entries are in front
+        while self.pending:
+            key = next(iter(self.pending))
+            if now - self.pending[key][0] <= self.timeout: break
+            del self.pending[key]
+            self.dropped += 1